@@ -18,6 +18,23 @@ MODEL_SIZE = "yolov8n.pt"            # Options: yolov8n.pt (nano), yolov8s.pt (s
                                      # yolov8m.pt (medium), yolov8l.pt (large)
                                      # Larger models = more accurate but slower
 
+# Trail camera model (YOLO weights trained once on the Roboflow trail camera dataset)
+USE_ROBOFLOW_MODEL = False            # Use the trail camera model instead of COCO YOLO
+ROBOFLOW_MODEL_PATH = "roboflow_model.pt"  # Local weights; falls back to YOLO if missing
+
+# TensorRT acceleration (NVIDIA GPUs only, ignored otherwise)
+USE_TENSORRT = False                  # Export the model to a TensorRT engine once and reuse it
+                                     # (needs the optional tensorrt package, see requirements.txt)
+ENGINE_PRECISION = "fp16"            # Options: fp16 (fast, no setup) or int8 (fastest, needs
+                                     # CALIBRATION_DATA pointing at a dataset YAML of trail cam images)
+CALIBRATION_DATA = None               # e.g. "calibration/trail_cam.yaml", only used for int8
+
+# CPU runtime (used when no GPU is available or ENABLE_GPU = False)
+CPU_BACKEND = "torch"                # Options: torch (plain PyTorch, no extra packages),
+                                     # onnx (ONNX Runtime, faster on any CPU) or
+                                     # openvino (fastest on Intel CPUs); onnx/openvino need the
+                                     # optional packages listed in requirements.txt
+
 # Wildlife classes to detect (from COCO dataset)
 WILDLIFE_CLASSES = {
     'bird', 'cat', 'dog', 'horse', 'sheep', 'cow', 
@@ -35,6 +52,12 @@ MAX_ANIMALS_IN_NAME = 3               # Max animals to include in filename
 # Processing options
 SAVE_DETECTION_JSON = True            # Save detailed detection info as JSON files
 COPY_ORIGINALS = True                 # Copy files (True) or move them (False)
+LINK_MODE = "copy"                    # How originals are placed in OUTPUT_DIR:
+                                     # copy = full independent copy (safe default)
+                                     # reflink = instant copy-on-write clone (btrfs/XFS, Linux)
+                                     # hardlink = instant, no extra space, but editing an output
+                                     #   photo also edits the original (same drive only)
+                                     # hardlink/reflink fall back to copy when unsupported
 SAVE_ALL_PHOTOS = False               # Save all photos (True) or only wildlife photos (False)
 BATCH_SIZE = 10                       # Number of images to process at once
 
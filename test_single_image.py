@@ -70,17 +70,11 @@ def test_single_image(image_path):
                 print(f"  Size: {img.size[0]}x{img.size[1]} pixels")
                 print(f"  Format: {img.format}")
                 
-                # Try to get EXIF date
-                exif_data = img._getexif()
+                # Try to get EXIF date (look up DateTime by tag id)
+                exif_data = img.getexif()
                 if exif_data:
-                    from PIL.ExifTags import TAGS
-                    for tag, value in exif_data.items():
-                        tag_name = TAGS.get(tag, tag)
-                        if tag_name == 'DateTime':
-                            print(f"  Date taken: {value}")
-                            break
-                    else:
-                        print(f"  Date taken: Not found in EXIF")
+                    date_taken = exif_data.get(0x0132)  # DateTime
+                    print(f"  Date taken: {date_taken if date_taken else 'Not found in EXIF'}")
                 else:
                     print(f"  Date taken: No EXIF data")
         except Exception as e:
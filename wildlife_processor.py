@@ -6,15 +6,97 @@ Detects animals in photos and organizes them by date and species
 
 import os
 import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
 import cv2
-from PIL import Image
-from PIL.ExifTags import TAGS
 import json
+import numpy as np
+import torch
 from ultralytics import YOLO
 import config
 
+try:
+    import orjson  # Optional, much faster JSON encoding
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl  # Only needed for reflinks, not available on Windows
+except ImportError:
+    fcntl = None
+
+IMAGE_SIZE = 640                    # Inference size; every image is letterboxed to this square
+FICLONE = 0x40049409                # Linux ioctl for copy-on-write clones (btrfs, XFS)
+EXIF_DATETIME_TAG = 0x0132          # DateTime in IFD0
+EXIF_HEADER_BYTES = 128 * 1024      # EXIF lives in an APP1 segment (max 64 KB) near the file start
+
+def _read_tiff_datetime(tiff):
+    """Look up the DateTime entry of IFD0 in a TIFF/EXIF block by tag id"""
+    byte_order = {b'II': 'little', b'MM': 'big'}.get(tiff[:2])
+    if byte_order is None:
+        return None
+    
+    def u16(offset):
+        return int.from_bytes(tiff[offset:offset + 2], byte_order)
+    
+    def u32(offset):
+        return int.from_bytes(tiff[offset:offset + 4], byte_order)
+    
+    ifd = u32(4)
+    if ifd + 2 > len(tiff):
+        return None
+    
+    # Each IFD entry is 12 bytes: tag, type, count, value/offset
+    end = min(ifd + 2 + 12 * u16(ifd), len(tiff) - 11)
+    for entry in range(ifd + 2, end, 12):
+        if u16(entry) == EXIF_DATETIME_TAG:
+            count = u32(entry + 4)
+            offset = entry + 8 if count <= 4 else u32(entry + 8)
+            return tiff[offset:offset + count].split(b'\x00')[0].decode('ascii')
+    return None
+
+def _read_png_datetime(data):
+    """Look up DateTime in the eXIf chunk of a PNG file"""
+    pos = 8
+    while pos + 8 <= len(data):
+        length = int.from_bytes(data[pos:pos + 4], 'big')
+        chunk_type = data[pos + 4:pos + 8]
+        if chunk_type == b'eXIf':
+            return _read_tiff_datetime(data[pos + 8:pos + 8 + length])
+        if chunk_type == b'IEND':
+            return None
+        pos += 12 + length  # Length, type, data, CRC
+    return None
+
+def _read_exif_datetime(data):
+    """Return the raw EXIF DateTime string from the start of a JPEG, TIFF or PNG file, or None"""
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        # A TIFF file is itself the TIFF block EXIF uses
+        return _read_tiff_datetime(data)
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return _read_png_datetime(data)
+    if data[:2] != b'\xff\xd8':
+        return None
+    
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):  # End of image / start of scan: no more metadata
+            return None
+        
+        length = int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b'Exif\x00\x00':
+            return _read_tiff_datetime(data[pos + 10:pos + 2 + length])
+        pos += 2 + length
+    return None
+
 class WildlifeProcessor:
     def __init__(self, input_dir, output_dir, confidence_threshold=0.3):
         self.input_dir = Path(input_dir)
@@ -25,55 +107,140 @@ class WildlifeProcessor:
         # Create output directory
         self.output_dir.mkdir(exist_ok=True)
         
-        # Try Roboflow trail camera model first
-        if hasattr(config, 'USE_ROBOFLOW_MODEL') and config.USE_ROBOFLOW_MODEL and config.ROBOFLOW_API_KEY:
-            try:
-                from roboflow import Roboflow
-                rf = Roboflow(api_key=config.ROBOFLOW_API_KEY)
-                workspace = rf.workspace("sanskriti-jain")
-                project = workspace.project("trail-camera-animal-detection")
-                self.model = project.version(6).model
-                print("✓ Using Roboflow trail camera model!")
-                self.using_roboflow = True
-                # Roboflow models have different class names
-                self.wildlife_classes = set()  # Will be determined by model
-            except Exception as e:
-                print(f"✗ Roboflow failed: {e}")
-                print("Falling back to YOLO...")
-                self.model = YOLO('yolov8n.pt')
-                self.using_roboflow = False
+        # Inference only: skip autograd bookkeeping, and let cuDNN autotune
+        # its kernels once for the fixed 640x640 input size
+        torch.set_grad_enabled(False)
+        self.use_gpu = getattr(config, 'ENABLE_GPU', True) and torch.cuda.is_available()
+        if self.use_gpu:
+            torch.backends.cudnn.benchmark = True
+        
+        # Shared YOLO inference settings; FP16 runs on the GPU's Tensor Cores
+        self.predict_args = {'verbose': False, 'imgsz': IMAGE_SIZE}
+        if self.use_gpu:
+            self.predict_args.update(device=0, half=True)
         else:
-            print("Loading YOLO model...")
-            self.model = YOLO('yolov8n.pt')
-            self.using_roboflow = False
+            self.predict_args.update(device='cpu')
         
-        # Set wildlife classes based on model type
-        if not self.using_roboflow:
+        # Try the trail camera model first: local YOLO weights trained on the
+        # Roboflow trail camera dataset, so it runs through the same local path
+        roboflow_weights = Path(getattr(config, 'ROBOFLOW_MODEL_PATH', 'roboflow_model.pt'))
+        if getattr(config, 'USE_ROBOFLOW_MODEL', False) and roboflow_weights.exists():
+            self.model = self.load_yolo_model(str(roboflow_weights))
+            print("✓ Using trail camera model!")
+            # Every class in the trail camera model is an animal
+            self.wildlife_classes = set(self.model.names.values())
+        else:
+            if getattr(config, 'USE_ROBOFLOW_MODEL', False):
+                print(f"✗ Trail camera weights not found: {roboflow_weights}")
+                print("  Download the dataset with project.version(6).download('yolov8'),")
+                print("  train once with 'yolo train data=<dataset>/data.yaml model=yolov8n.pt',")
+                print("  and copy runs/detect/train/weights/best.pt to ROBOFLOW_MODEL_PATH.")
+                print("Falling back to YOLO...")
+            else:
+                print("Loading YOLO model...")
+            self.model = self.load_yolo_model('yolov8n.pt')
+            
             # COCO classes that actually exist
             self.wildlife_classes = {
                 'bird', 'cat', 'dog', 'horse', 'sheep', 'cow', 
                 'bear', 'zebra', 'giraffe', 'elephant', 'person'
             }
         
+        # Filter detections by class id so names are only looked up for kept boxes
+        self.wildlife_class_ids = frozenset(
+            class_id for class_id, name in self.model.names.items()
+            if name in self.wildlife_classes
+        )
+        
+        # Capture dates, filled in by process_all_images
+        self.dates = {}
+        
+        # Background pool for output writes, active only during process_all_images
+        self.io_pool = None
+        self.io_pending = {}
+        
         # Stats tracking
         self.stats = {
             'total_processed': 0,
             'wildlife_found': 0,
-            'animals_detected': {},
+            'animals_detected': Counter(),
             'errors': []
         }
     
-    def get_image_date(self, image_path):
-        """Extract date from image EXIF data or file modification time"""
+    def load_yolo_model(self, weights):
+        """Load YOLO weights, exported once to the fastest runtime available on this machine"""
+        stem = Path(weights).stem
+        
+        if self.use_gpu:
+            if not getattr(config, 'USE_TENSORRT', False):
+                return YOLO(weights)
+            
+            precision = getattr(config, 'ENGINE_PRECISION', 'fp16')
+            calibration_data = getattr(config, 'CALIBRATION_DATA', None)
+            if precision == 'int8' and not calibration_data:
+                # Without trail cam images Ultralytics would calibrate on COCO instead
+                print("✗ ENGINE_PRECISION = 'int8' needs CALIBRATION_DATA; building an fp16 engine instead")
+                precision = 'fp16'
+            
+            batch_size = max(1, getattr(config, 'BATCH_SIZE', 1))
+            export_args = {
+                'format': 'engine',
+                'device': 0,
+                'batch': batch_size,
+                'dynamic': True,  # Allow the smaller final batch
+            }
+            if precision == 'int8':
+                export_args['int8'] = True
+                export_args['data'] = calibration_data
+            else:
+                export_args['half'] = True
+            
+            # The engine's max batch and input size are fixed at build time, so they are part of its name
+            engine_path = Path(weights).with_name(f"{stem}_{precision}_b{batch_size}_{IMAGE_SIZE}.engine")
+            return self.load_exported_model(weights, engine_path, f"TensorRT {precision}", export_args)
+        
+        backend = getattr(config, 'CPU_BACKEND', 'torch')
+        if backend == 'onnx':
+            onnx_path = Path(weights).with_suffix('.onnx')
+            return self.load_exported_model(weights, onnx_path, "ONNX",
+                                            {'format': 'onnx', 'dynamic': True, 'simplify': True})
+        if backend == 'openvino':
+            openvino_path = Path(weights).with_name(f"{stem}_openvino_model")
+            return self.load_exported_model(weights, openvino_path, "OpenVINO",
+                                            {'format': 'openvino', 'dynamic': True})
+        return YOLO(weights)
+    
+    def load_exported_model(self, weights, export_path, runtime, export_args):
+        """Load a cached export of the weights, creating it on first use"""
         try:
-            # Try to get date from EXIF
-            with Image.open(image_path) as img:
-                exif_data = img._getexif()
-                if exif_data:
-                    for tag, value in exif_data.items():
-                        tag_name = TAGS.get(tag, tag)
-                        if tag_name == 'DateTime':
-                            return datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+            if not export_path.exists():
+                print(f"Exporting {runtime} model (one-time, may take a few minutes)...")
+                exported = YOLO(weights).export(imgsz=IMAGE_SIZE, **export_args)
+                Path(exported).rename(export_path)
+            
+            model = YOLO(str(export_path), task='detect')
+            
+            # Warm up on a blank image so a stale export (e.g. after a TensorRT or
+            # driver upgrade) fails here instead of on every photo
+            model(np.zeros((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8), **self.predict_args)
+        except Exception as e:
+            print(f"✗ {runtime} model failed: {e}")
+            print("Falling back to PyTorch model...")
+            return YOLO(weights)
+        
+        print(f"✓ Using {runtime} model: {export_path}")
+        return model
+    
+    def get_image_date(self, image_path, data=None):
+        """Extract date from image EXIF data (or already-read file bytes) or file modification time"""
+        try:
+            # Only the file header is needed; DateTime is looked up by tag id
+            if data is None:
+                with open(image_path, 'rb') as f:
+                    data = f.read(EXIF_HEADER_BYTES)
+            value = _read_exif_datetime(data)
+            if value:
+                return datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
         except Exception as e:
             print(f"EXIF error for {image_path}: {e}")
         
@@ -81,54 +248,85 @@ class WildlifeProcessor:
         timestamp = os.path.getmtime(image_path)
         return datetime.fromtimestamp(timestamp)
     
+    def load_image(self, image_path):
+        """Read an image file once, returning its capture date and decoded BGR array"""
+        try:
+            data = image_path.read_bytes()
+        except OSError as e:
+            self.stats['errors'].append(f"Read error for {image_path}: {e}")
+            return None, None
+        
+        # EXIF and pixels both come from the same buffer, so the file is only read once.
+        # Failures must not escape: they would end the whole run from future.result()
+        try:
+            date_taken = self.get_image_date(image_path, data)
+        except OSError:
+            date_taken = None  # process_single_image retries and records the error
+        
+        try:
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        except cv2.error:
+            image = None  # e.g. zero-byte files; detect_batch records it as unreadable
+        return date_taken, image
+    
     def detect_wildlife(self, image_path):
         """Run detection on image and return wildlife found"""
         try:
-            if self.using_roboflow:
-                # Roboflow API
-                results = self.model.predict(str(image_path), confidence=40, overlap=30)
-                
-                wildlife_detected = []
-                for prediction in results.json().get('predictions', []):
-                    class_name = prediction['class']
-                    confidence = prediction['confidence']
-                    
-                    if confidence >= self.confidence_threshold:
-                        wildlife_detected.append({
-                            'animal': class_name,
-                            'confidence': confidence,
-                            'bbox': [prediction['x'], prediction['y'], prediction['width'], prediction['height']]
-                        })
-                
-                return wildlife_detected
-                
-            else:
-                # YOLO API (your existing code)
-                results = self.model(image_path, verbose=False)
-                
-                wildlife_detected = []
-                for result in results:
-                    boxes = result.boxes
-                    if boxes is not None:
-                        for box in boxes:
-                            class_id = int(box.cls[0])
-                            class_name = self.model.names[class_id]
-                            confidence = float(box.conf[0])
-                            
-                            if (class_name in self.wildlife_classes and 
-                                confidence >= self.confidence_threshold):
-                                wildlife_detected.append({
-                                    'animal': class_name,
-                                    'confidence': confidence,
-                                    'bbox': box.xyxy[0].tolist()
-                                })
-                
-                return wildlife_detected
-                
+            results = self.model(str(image_path), **self.predict_args)
+            return self.parse_result(results[0])
         except Exception as e:
             self.stats['errors'].append(f"Detection error for {image_path}: {e}")
             return []
     
+    def parse_result(self, result):
+        """Extract wildlife detections from a single YOLO Results object"""
+        wildlife_detected = []
+        boxes = result.boxes
+        if boxes is not None and len(boxes):
+            # One device-to-host copy per tensor instead of a sync per box
+            class_ids = boxes.cls.cpu().numpy().astype(int)
+            confidences = boxes.conf.cpu().numpy()
+            coords = boxes.xyxy.cpu().numpy()
+            
+            keep = ((confidences >= self.confidence_threshold) &
+                    np.isin(class_ids, list(self.wildlife_class_ids)))
+            for class_id, confidence, bbox in zip(class_ids[keep], confidences[keep], coords[keep]):
+                wildlife_detected.append({
+                    'animal': self.model.names[int(class_id)],
+                    'confidence': float(confidence),
+                    'bbox': bbox.tolist()
+                })
+        
+        return wildlife_detected
+    
+    def detect_batch(self, image_paths, images):
+        """Run detection on a batch of decoded images, returning one list of wildlife per image"""
+        batch_animals = [[] for _ in image_paths]
+        loaded = []
+        for i, (image_path, image) in enumerate(zip(image_paths, images)):
+            if image is None:
+                self.stats['errors'].append(f"Detection error for {image_path}: could not read image")
+            else:
+                loaded.append(i)
+        
+        if not loaded:
+            return batch_animals
+        
+        try:
+            # Same imgsz for every image so Ultralytics stacks the batch into one tensor.
+            # A list source is a single batch whose Results all live until it is done,
+            # so BATCH_SIZE is what bounds memory here (stream=True would not help)
+            results = self.model([images[i] for i in loaded], **self.predict_args)
+            for i, result in zip(loaded, results):
+                batch_animals[i] = self.parse_result(result)
+        except Exception as e:
+            # One bad image fails the whole batch, so retry image by image
+            print(f"  Batch detection failed ({e}), retrying images individually")
+            for i in loaded:
+                batch_animals[i] = self.detect_wildlife(image_paths[i])
+        
+        return batch_animals
+    
     def create_filename(self, original_path, date_taken, animals):
         """Create new filename with date and animals"""
         date_str = date_taken.strftime('%Y-%m-%d_%H-%M-%S')
@@ -154,18 +352,70 @@ class WildlifeProcessor:
         }
         
         json_path = output_path.with_suffix('.json')
-        with open(json_path, 'w') as f:
-            json.dump(info, f, indent=2)
+        if orjson is not None:
+            json_path.write_bytes(orjson.dumps(info, option=orjson.OPT_INDENT_2))
+        else:
+            with open(json_path, 'w') as f:
+                json.dump(info, f, indent=2)
+    
+    def place_file(self, src, dst):
+        """Place src at dst using config.LINK_MODE, falling back to a full copy"""
+        mode = getattr(config, 'LINK_MODE', 'copy')
+        
+        # Re-running over an already-processed folder (or a previous hardlink run)
+        # can map a photo onto itself: it is already in place, and unlinking would delete it
+        if dst.exists() and os.path.samefile(src, dst):
+            return
+        
+        # Drop any previous output so a copy never writes through an existing hardlink
+        dst.unlink(missing_ok=True)
+        
+        try:
+            if mode == 'hardlink':
+                os.link(src, dst)
+                return
+            if mode == 'reflink' and fcntl is not None:
+                with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+                    fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            pass  # Cross-device or unsupported filesystem
+        
+        shutil.copy2(src, dst)
     
-    def process_single_image(self, image_path):
-        """Process a single image"""
+    def run_io(self, output_path, func, *args):
+        """Run a file write on the background I/O pool, or inline when no pool is active"""
+        if self.io_pool is None:
+            func(*args)
+            return
+        
+        # Burst shots can map to the same filename; never write one file from two threads
+        previous = self.io_pending.get(output_path)
+        if previous is not None:
+            wait([previous])
+        
+        future = self.io_pool.submit(func, *args)
+        future.add_done_callback(lambda f: self.record_io_error(f, output_path))
+        self.io_pending[output_path] = future
+    
+    def record_io_error(self, future, output_path):
+        """Record a failed background write in the stats"""
+        if future.exception() is not None:
+            self.stats['errors'].append(f"Write error for {output_path}: {future.exception()}")
+    
+    def process_single_image(self, image_path, animals=None):
+        """Process a single image, optionally with detections already computed"""
         print(f"Processing: {image_path.name}")
         
-        # Get image date
-        date_taken = self.get_image_date(image_path)
+        # Get image date (already read with the image by process_all_images when available)
+        date_taken = self.dates.get(image_path)
+        if date_taken is None:
+            date_taken = self.get_image_date(image_path)
         
         # Detect wildlife
-        animals = self.detect_wildlife(image_path)
+        if animals is None:
+            animals = self.detect_wildlife(image_path)
         
         # Create new filename
         new_filename = self.create_filename(image_path, date_taken, animals)
@@ -173,19 +423,12 @@ class WildlifeProcessor:
         
         # Copy image to output directory (if configured to save all, or if wildlife found)
         if self.save_all_photos or animals:
-            shutil.copy2(image_path, output_path)
+            self.run_io(output_path, self.place_file, image_path, output_path)
             
             # Save detection info if animals found
             if animals:
-                self.save_detection_info(output_path, animals, image_path)
-                self.stats['wildlife_found'] += 1
-                
-                # Update animal counts
-                for animal in animals:
-                    name = animal['animal']
-                    self.stats['animals_detected'][name] = self.stats['animals_detected'].get(name, 0) + 1
-        
-        self.stats['total_processed'] += 1
+                self.run_io(output_path.with_suffix('.json'), self.save_detection_info,
+                            output_path, animals, image_path)
         
         return len(animals) > 0, self.save_all_photos or len(animals) > 0
     
@@ -194,11 +437,12 @@ class WildlifeProcessor:
         # Supported image formats
         image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp'}
         
-        # Find all image files
-        image_files = []
-        for ext in image_extensions:
-            image_files.extend(self.input_dir.glob(f"*{ext}"))
-            image_files.extend(self.input_dir.glob(f"*{ext.upper()}"))
+        # Find all image files in a single directory pass (extension match is case-insensitive)
+        with os.scandir(self.input_dir) as entries:
+            image_files = sorted(
+                Path(entry.path) for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in image_extensions
+            )
         
         print(f"Found {len(image_files)} images to process")
         
@@ -206,23 +450,65 @@ class WildlifeProcessor:
             print("No image files found!")
             return
         
-        # Process each image
-        for i, image_path in enumerate(image_files, 1):
-            try:
-                has_wildlife, was_saved = self.process_single_image(image_path)
-                if was_saved:
-                    status = "✓ Wildlife found" if has_wildlife else "✓ Saved (no wildlife)"
-                else:
-                    status = "- Skipped (no wildlife)"
-                print(f"  [{i}/{len(image_files)}] {status}")
-                
-            except Exception as e:
-                error_msg = f"Failed to process {image_path}: {e}"
-                print(f"  [ERROR] {error_msg}")
-                self.stats['errors'].append(error_msg)
+        # Process images in batches so YOLO runs one forward pass per batch
+        batch_size = max(1, getattr(config, 'BATCH_SIZE', 1))
+        batches = [image_files[i:i + batch_size] for i in range(0, len(image_files), batch_size)]
+        
+        # Copies and JSON sidecars are written in the background so detection never waits on disk
+        self.io_pool = ThreadPoolExecutor(max_workers=4)
+        self.io_pending = {}
+        
+        try:
+            self.run_batches(image_files, batches, batch_size)
+        finally:
+            self.io_pool.shutdown(wait=True)
+            self.io_pool = None
+            self.io_pending = {}
         
         self.print_summary()
     
+    def run_batches(self, image_files, batches, batch_size):
+        """Decode, detect and save each batch, prefetching the next batch in the background"""
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as loader:
+            pending = [loader.submit(self.load_image, p) for p in batches[0]]
+            
+            for batch_index, batch in enumerate(batches):
+                dates, images = zip(*(future.result() for future in pending))
+                self.dates.update(zip(batch, dates))
+                
+                # Start reading the next batch while the model works on this one
+                if batch_index + 1 < len(batches):
+                    pending = [loader.submit(self.load_image, p) for p in batches[batch_index + 1]]
+                
+                batch_animals = self.detect_batch(batch, images)
+                start = batch_index * batch_size
+                processed = 0
+                wildlife = []
+                
+                for i, (image_path, animals) in enumerate(zip(batch, batch_animals), start + 1):
+                    try:
+                        has_wildlife, was_saved = self.process_single_image(image_path, animals)
+                        processed += 1
+                        if has_wildlife:
+                            wildlife.append(animals)
+                        if was_saved:
+                            status = "✓ Wildlife found" if has_wildlife else "✓ Saved (no wildlife)"
+                        else:
+                            status = "- Skipped (no wildlife)"
+                        print(f"  [{i}/{len(image_files)}] {status}")
+                    
+                    except Exception as e:
+                        error_msg = f"Failed to process {image_path}: {e}"
+                        print(f"  [ERROR] {error_msg}")
+                        self.stats['errors'].append(error_msg)
+                
+                # Update stats once per batch rather than per image
+                self.stats['total_processed'] += processed
+                self.stats['wildlife_found'] += len(wildlife)
+                self.stats['animals_detected'].update(
+                    animal['animal'] for animals in wildlife for animal in animals
+                )
+    
     def print_summary(self):
         """Print processing summary"""
         print("\n" + "="*50)
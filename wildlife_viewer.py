@@ -4,13 +4,52 @@ Wildlife Detection Viewer
 Simple local viewer to display trail cam images with bounding boxes from JSON detection files
 """
 
-import json
+import functools
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog, messagebox, ttk
+import PIL
 from PIL import Image, ImageTk, ImageDraw, ImageFont
+import numpy as np
 import os
 from pathlib import Path
 
+try:
+    from orjson import loads as json_loads  # Optional, much faster JSON parsing
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    import ijson  # Optional, streams very large detection files
+except ImportError:
+    ijson = None
+
+try:
+    # Optional SIMD-accelerated resampling
+    from pic_scale import resize as ps_resize, Resampling as PsResampling
+except ImportError:
+    ps_resize = None
+
+PILLOW_SIMD = '.post' in PIL.__version__  # Pillow-SIMD releases are versioned X.Y.Z.postN
+MAX_DISPLAY_SIZE = (1000, 600)
+CANVAS_BACKGROUND = '#bebebe'  # Tk's 'gray'; also fills transparent image areas
+STREAM_JSON_BYTES = 256_000  # Sidecars larger than this are streamed with ijson
+INDEX_FILENAME = '.wildlife_viewer_index'  # Cached sorted file list, one name per line
+NAVIGATION_DELAY_MS = 50  # Key-repeat presses within this window load only the final image
+RENDER_CACHE_SIZE = 32  # Rendered images kept for quick back-and-forth navigation
+
+@functools.lru_cache(maxsize=4)
+def get_font(size=24):
+    """Load the label font once per size"""
+    try:
+        return ImageFont.truetype("Arial.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.truetype("/System/Library/Fonts/Arial.ttf", size)  # macOS
+        except OSError:
+            return ImageFont.load_default()
+
 class WildlifeViewer:
     def __init__(self, root):
         self.root = root
@@ -23,6 +62,11 @@ class WildlifeViewer:
         self.image_files = []
         self.current_index = 0
         self.photo_ref = None  # Keep reference to prevent garbage collection
+        self.canvas_item = None  # Canvas image item, reused for every photo
+        self.target_index = None  # Where queued keyboard navigation will land
+        self.pending_navigation = None  # after() id of the queued navigation
+        self.render_cache = OrderedDict()  # (path, mtime) -> Future of render_image(), LRU order
+        self.render_pool = ThreadPoolExecutor(max_workers=2)  # Renders neighbours in the background
         
         # Setup UI
         self.setup_ui()
@@ -62,7 +106,7 @@ class WildlifeViewer:
         image_frame.pack(fill=tk.BOTH, expand=True)
         
         # Canvas with scrollbars
-        self.canvas = tk.Canvas(image_frame, bg='gray')
+        self.canvas = tk.Canvas(image_frame, bg=CANVAS_BACKGROUND)
         v_scrollbar = ttk.Scrollbar(image_frame, orient=tk.VERTICAL, command=self.canvas.yview)
         h_scrollbar = ttk.Scrollbar(image_frame, orient=tk.HORIZONTAL, command=self.canvas.xview)
         self.canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
@@ -76,10 +120,10 @@ class WildlifeViewer:
         self.canvas.bind("<Button-4>", self.on_mousewheel)
         self.canvas.bind("<Button-5>", self.on_mousewheel)
         
-        # Bind keyboard shortcuts
-        self.root.bind('<Left>', lambda e: self.prev_image())
-        self.root.bind('<Right>', lambda e: self.next_image())
-        self.root.bind('<space>', lambda e: self.next_image())
+        # Bind keyboard shortcuts (debounced so held keys don't render every skipped image)
+        self.root.bind('<Left>', lambda e: self.request_step(-1))
+        self.root.bind('<Right>', lambda e: self.request_step(1))
+        self.root.bind('<space>', lambda e: self.request_step(1))
         self.root.focus_set()  # Enable keyboard focus
         
     def on_mousewheel(self, event):
@@ -102,16 +146,31 @@ class WildlifeViewer:
         """Load all image files from the selected folder"""
         folder = Path(folder_path)
         
-        # Find all image files
-        image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp'}
-        self.image_files = []
-        
-        for ext in image_extensions:
-            self.image_files.extend(folder.glob(f"*{ext}"))
-            self.image_files.extend(folder.glob(f"*{ext.upper()}"))
+        # Reuse the saved file list unless the folder changed since it was written.
+        # Strictly newer: timestamps are coarse (2 s on FAT), so a file created in the
+        # same tick as the index must force a rescan
+        index_path = folder / INDEX_FILENAME
+        try:
+            if index_path.stat().st_mtime > folder.stat().st_mtime:
+                self.image_files = [folder / name for name in index_path.read_text().splitlines()]
+            else:
+                self.image_files = None
+        except OSError:
+            self.image_files = None
         
-        # Sort files
-        self.image_files.sort()
+        if self.image_files is None:
+            # Find all image files in a single directory pass (extension match is case-insensitive)
+            image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp'}
+            with os.scandir(folder) as entries:
+                self.image_files = sorted(
+                    Path(entry.path) for entry in entries
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in image_extensions
+                )
+            
+            try:
+                index_path.write_text(''.join(f"{path.name}\n" for path in self.image_files))
+            except OSError:
+                pass  # Read-only folder: just scan again next time
         
         if self.image_files:
             self.current_index = 0
@@ -133,99 +192,175 @@ class WildlifeViewer:
             return
             
         image_path = self.image_files[self.current_index]
-        json_path = image_path.with_suffix('.json')
         
         # Update file info
         self.file_label.config(text=f"File: {image_path.name}")
         
         try:
-            # Load image
-            image = Image.open(image_path)
-            
-            # Load JSON detection data if it exists
-            detections = []
-            if json_path.exists():
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                    detections = data.get('detections', [])
+            # Usually already rendered (or in progress) thanks to prefetching
+            key, future = self.request_render(image_path)
+            try:
+                image, detection_text = future.result()
+            except Exception:
+                # Drop failed renders so the next visit retries
+                self.render_cache.pop(key, None)
+                raise
             
-            # Draw bounding boxes
-            if detections:
-                image = self.draw_bounding_boxes(image, detections)
-                detection_text = f"Detections: {len(detections)} animals found"
-                for i, det in enumerate(detections):
-                    animal = det['animal']
-                    confidence = det['confidence']
-                    detection_text += f"\n  {i+1}. {animal}: {confidence:.2f}"
+            # Convert to PhotoImage (Tk objects must be created on the main thread),
+            # pasting into the existing one when the size matches
+            if (self.photo_ref is None or self.photo_ref.width() != image.width or
+                    self.photo_ref.height() != image.height):
+                self.photo_ref = ImageTk.PhotoImage(image)
             else:
-                detection_text = "No detections found"
-                
-            self.detection_label.config(text=detection_text)
+                self.photo_ref.paste(image)
             
-            # Resize image if too large
-            max_size = (1000, 600)
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage
-            self.photo_ref = ImageTk.PhotoImage(image)
+            self.detection_label.config(text=detection_text)
             
-            # Clear canvas and add image
-            self.canvas.delete("all")
-            self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo_ref)
+            # Add image to the canvas once, then just point the same item at the current photo
+            if self.canvas_item is None:
+                self.canvas_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo_ref)
+            else:
+                self.canvas.itemconfig(self.canvas_item, image=self.photo_ref)
             
-            # Update scroll region
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            # Update scroll region (the image is the only item, so its size is the extent)
+            self.canvas.configure(scrollregion=(0, 0, self.photo_ref.width(), self.photo_ref.height()))
             
         except Exception as e:
             messagebox.showerror("Error", f"Error loading image: {e}")
+        
+        # Render the neighbours while the user looks at this one
+        self.prefetch_neighbors()
             
-    def draw_bounding_boxes(self, image, detections):
-        """Draw bounding boxes on the image"""
-        # Create a copy to draw on
-        image_copy = image.copy()
-        draw = ImageDraw.Draw(image_copy)
+    def request_render(self, image_path):
+        """Return the cache key and render future for an image, starting a background render if needed"""
+        # Keyed by mtime so files changed on disk are rendered again
+        key = (str(image_path), image_path.stat().st_mtime)
+        future = self.render_cache.get(key)
+        if future is None:
+            future = self.render_pool.submit(self.render_image, image_path)
+            self.render_cache[key] = future
+            if len(self.render_cache) > RENDER_CACHE_SIZE:
+                self.render_cache.popitem(last=False)
+        else:
+            self.render_cache.move_to_end(key)
+        return key, future
         
-        # Try to load a font
+    def prefetch_neighbors(self):
+        """Start rendering the next and previous images in the background"""
+        for index in (self.current_index + 1, self.current_index - 1):
+            if 0 <= index < len(self.image_files):
+                try:
+                    self.request_render(self.image_files[index])
+                except OSError:
+                    pass  # Reported when the user navigates to it
+            
+    def render_image(self, image_path):
+        """Load an image with its detections drawn and resized for display (runs off the Tk thread)"""
+        json_path = image_path.with_suffix('.json')
+        
+        # Load image
+        image = Image.open(image_path)
+        original_width = image.width
+        
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when full resolution isn't needed
+        if image.format == 'JPEG':
+            image.draft('RGB', MAX_DISPLAY_SIZE)
+        
+        # Always RGB: pic-scale only resizes a few modes (no P or CMYK), and the
+        # result is pasted into the shared PhotoImage. Transparent areas are filled
+        # with the canvas color so they look the same as before instead of black
+        if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            background = Image.new('RGBA', image.size, CANVAS_BACKGROUND)
+            image = Image.alpha_composite(background, image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # Resize before drawing so Lanczos runs on unannotated pixels and boxes
+        # are drawn at display resolution
+        image = self.resize_for_display(image)
+        scale = image.width / original_width
+        
+        # Load JSON detection data if it exists (no separate exists() check)
         try:
-            font = ImageFont.truetype("Arial.ttf", 24)
-        except:
-            try:
-                font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 24)  # macOS
-            except:
-                font = ImageFont.load_default()
+            if ijson is not None and json_path.stat().st_size > STREAM_JSON_BYTES:
+                # Only pull the detections array out of very large files
+                with open(json_path, 'rb') as f:
+                    detections = list(ijson.items(f, 'detections.item', use_float=True))
+            else:
+                detections = json_loads(json_path.read_bytes()).get('detections', [])
+        except FileNotFoundError:
+            detections = []
+        
+        # Draw bounding boxes
+        if detections:
+            image = self.draw_bounding_boxes(image, detections, scale)
+            lines = [f"Detections: {len(detections)} animals found"]
+            lines.extend(f"  {i+1}. {det['animal']}: {det['confidence']:.2f}"
+                         for i, det in enumerate(detections))
+            detection_text = "\n".join(lines)
+        else:
+            detection_text = "No detections found"
+        
+        # Finish decoding here so the main thread only has to copy the pixels
+        image.load()
+        
+        return image, detection_text
+        
+    def resize_for_display(self, image, max_size=MAX_DISPLAY_SIZE):
+        """Downscale image to fit max_size, keeping aspect ratio (never upscales)"""
+        scale = min(max_size[0] / image.width, max_size[1] / image.height)
+        if scale >= 1:
+            return image
+        
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if ps_resize is not None:
+            return ps_resize(image, target, PsResampling.LANCZOS)
+        return image.resize(target, Image.Resampling.LANCZOS)
+        
+    def draw_bounding_boxes(self, image, detections, scale=1.0):
+        """Draw bounding boxes onto the image in place (scaling original-resolution bboxes) and return it"""
+        # No copy: callers don't reuse the undrawn image, so skip a full-size memcpy
+        draw = ImageDraw.Draw(image)
+        
+        # Keep labels the same size relative to the photo as at full resolution
+        font = get_font(max(10, int(24 * scale)))
+        
+        # Bboxes are in original image pixels; the image may be a reduced-scale decode
+        original_width, original_height = image.width / scale, image.height / scale
         
         # Colors for different animals
         colors = ['red', 'blue', 'green', 'yellow', 'orange', 'purple', 'cyan', 'magenta']
         
-        for i, detection in enumerate(detections):
-            animal = detection['animal']
-            confidence = detection['confidence']
-            bbox = detection['bbox']
-            
-            # Handle different bbox formats
-            if len(bbox) == 4:
-                # Check if it's [x, y, width, height] or [x1, y1, x2, y2]
-                x, y, w_or_x2, h_or_y2 = bbox
-                
-                # If values look like width/height (typically smaller than coordinates)
-                if w_or_x2 < image.width and h_or_y2 < image.height and w_or_x2 < 2000 and h_or_y2 < 2000:
-                    # Assume [x, y, width, height] format (Roboflow style)
-                    x1, y1 = int(x - w_or_x2/2), int(y - h_or_y2/2)  # Convert center to top-left
-                    x2, y2 = int(x + w_or_x2/2), int(y + h_or_y2/2)
-                else:
-                    # Assume [x1, y1, x2, y2] format (YOLO style)
-                    x1, y1, x2, y2 = int(x), int(y), int(w_or_x2), int(h_or_y2)
-            else:
-                continue  # Skip malformed bboxes
-            
-            # Choose color
-            color = colors[i % len(colors)]
-            
-            # Draw rectangle
+        # Skip malformed bboxes, keeping each detection's index for its color
+        valid = [(i, detection) for i, detection in enumerate(detections) if len(detection['bbox']) == 4]
+        if not valid:
+            return image
+        
+        # Convert all bboxes at once: [x, y, width, height] or [x1, y1, x2, y2]
+        x, y, w_or_x2, h_or_y2 = np.array([d['bbox'] for _, d in valid], dtype=np.float32).T
+        
+        # If values look like width/height (typically smaller than coordinates),
+        # assume [x, y, width, height] format (Roboflow style), else [x1, y1, x2, y2] (YOLO style)
+        is_center = ((w_or_x2 < original_width) & (h_or_y2 < original_height) &
+                     (w_or_x2 < 2000) & (h_or_y2 < 2000))
+        corners = np.stack([
+            np.where(is_center, x - w_or_x2/2, x),  # Convert center to top-left
+            np.where(is_center, y - h_or_y2/2, y),
+            np.where(is_center, x + w_or_x2/2, w_or_x2),
+            np.where(is_center, y + h_or_y2/2, h_or_y2),
+        ], axis=1)
+        corners = (corners * scale).astype(np.int32).tolist()
+        
+        # Draw in three passes (outlines, label backgrounds, label text) so
+        # Pillow repeats the same primitive instead of switching per box
+        colors_used = [colors[i % len(colors)] for i, _ in valid]
+        for (x1, y1, x2, y2), color in zip(corners, colors_used):
             draw.rectangle([x1, y1, x2, y2], outline=color, width=3)
-            
-            # Draw label
-            label = f"{animal}: {confidence:.2f}"
+        
+        labels = []
+        for (_, detection), (x1, y1, _, _), color in zip(valid, corners, colors_used):
+            label = f"{detection['animal']}: {detection['confidence']:.2f}"
             
             # Get text size
             bbox_text = draw.textbbox((0, 0), label, font=font)
@@ -234,11 +369,12 @@ class WildlifeViewer:
             
             # Draw background for text
             draw.rectangle([x1, y1-text_height-5, x1+text_width+10, y1], fill=color)
+            labels.append((x1+5, y1-text_height-2, label))
+        
+        for x, y, label in labels:
+            draw.text((x, y), label, fill='white', font=font)
             
-            # Draw text
-            draw.text((x1+5, y1-text_height-2), label, fill='white', font=font)
-            
-        return image_copy
+        return image
         
     def prev_image(self):
         """Go to previous image"""
@@ -253,8 +389,31 @@ class WildlifeViewer:
             self.current_index += 1
             self.update_counter()
             self.load_current_image()
+            
+    def request_step(self, step):
+        """Queue keyboard navigation by step images, coalescing key-repeat into one load"""
+        if not self.image_files:
+            return
+        
+        base = self.current_index if self.target_index is None else self.target_index
+        self.target_index = max(0, min(base + step, len(self.image_files) - 1))
+        
+        # Load at most once per NAVIGATION_DELAY_MS while a key is held
+        if self.pending_navigation is None:
+            self.pending_navigation = self.root.after(NAVIGATION_DELAY_MS, self.apply_target)
+            
+    def apply_target(self):
+        """Jump straight to the queued navigation target"""
+        self.pending_navigation = None
+        target, self.target_index = self.target_index, None
+        if target is not None and target != self.current_index and target < len(self.image_files):
+            self.current_index = target
+            self.update_counter()
+            self.load_current_image()
 
 def main():
+    if not PILLOW_SIMD:
+        print("Tip: install Pillow-SIMD for faster image display (see README)")
     root = tk.Tk()
     app = WildlifeViewer(root)
     root.mainloop()